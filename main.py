@@ -1,9 +1,11 @@
+import asyncio
+import json
 import os
-import requests
-import pandas as pd
-from bs4 import BeautifulSoup
-import spacy
-from dotenv import load_dotenv
+import sqlite3
+import httpx
+import numpy as np
+import threading
+from lxml import etree
 from googlesearch import search
 import time
 
@@ -12,26 +14,126 @@ import time
 # but config remains structured)
 # E501 FIX: Breaking the long comment line
 # The goal is to set up structured config for future scaling.
-load_dotenv()
+
+
+def _find_dotenv():
+    """
+    Returns the nearest .env in this script's directory or any parent (the
+    same search dotenv's find_dotenv() does), or None if there is none.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        candidate = os.path.join(directory, ".env")
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+# python-dotenv is only imported when there is a .env file to read and the
+# shell has not already provided the key, keeping one-shot runs lean.
+DOTENV_PATH = (
+    None if "GOOGLE_MAPS_API_KEY" in os.environ else _find_dotenv()
+)
+if DOTENV_PATH is not None:
+    from dotenv import load_dotenv
+    load_dotenv(DOTENV_PATH)
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
-# Load the NLP model once
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("NLP Model 'en_core_web_sm' not found. "
-          "Run: python -m spacy download en_core_web_sm")
-    nlp = None
+# HTTP client settings for the audit phase. Connections are pooled and kept
+# alive so repeat hosts skip the TCP+TLS handshake, and HTTP/2 multiplexes
+# same-host audits over a single socket; transient connection failures are
+# retried with exponential backoff.
+AUDIT_TIMEOUT = httpx.Timeout(5.0)
+AUDIT_LIMITS = httpx.Limits(max_connections=100,
+                            max_keepalive_connections=20,
+                            keepalive_expiry=30)
+AUDIT_CONCURRENCY = 10
+AUDIT_MAX_RETRIES = 2
+AUDIT_BACKOFF_FACTOR = 0.2
+# Only the top of each page is read; 256 KiB comfortably covers <head> and
+# the hero section where SSL/CTA signals live, and bounds memory per audit.
+AUDIT_MAX_BODY_BYTES = 256 * 1024
+# Audits of 2xx pages are persisted by URL in a small SQLite file for 24h,
+# so repeat reports (including the next scheduled run) skip the network for
+# competitors audited recently.
+AUDIT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "crgg_audit_cache.sqlite3")
+AUDIT_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# The NLP model is loaded lazily (see _get_nlp) so report runs that never
+# touch review text do not pay for importing spaCy and its model weights.
+nlp = None
+_nlp_loaded = False
+
+
+# Any <a> whose text (including nested markup) mentions 'appointment',
+# case-insensitively. Evaluated by libxml2, so the whole check runs in C.
+_CTA_XPATH = (
+    "//a[contains(translate(., 'APOINTMEN', 'apointmen'), 'appointment')]"
+)
+# lxml parsers are reusable but not shareable across threads; each thread
+# keeps its own so no parser is allocated per page.
+_PARSER = threading.local()
+
+# Opened on first use; False once opening has failed (cache disabled).
+_AUDIT_DB = None
 
 
 # --- CORE CRGG FUNCTIONS ---
 
-def get_competitor_list(target_name: str, location: str,
-                        search_type: str = "dentist", limit: int = 5) -> list:
+def _get_nlp():
+    """
+    Loads the spaCy model on first use; returns None if unavailable. The
+    load is attempted only once, so a missing model is reported once.
+    """
+    global nlp, _nlp_loaded
+    if not _nlp_loaded:
+        import spacy
+        _nlp_loaded = True
+        try:
+            nlp = spacy.load("en_core_web_sm")
+        except OSError:
+            print("NLP Model 'en_core_web_sm' not found. "
+                  "Run: python -m spacy download en_core_web_sm")
+    return nlp
+
+
+def create_audit_client() -> httpx.AsyncClient:
+    """Builds the shared HTTP/2, connection-pooled client used for audits."""
+    return httpx.AsyncClient(http2=True, timeout=AUDIT_TIMEOUT,
+                             limits=AUDIT_LIMITS, follow_redirects=True)
+
+
+async def _stream_search(query: str, limit: int):
+    """
+    Yields search result URLs as they arrive. The blocking googlesearch
+    generator is advanced on a worker thread so the event loop stays free.
+    """
+    loop = asyncio.get_running_loop()
+    # CRITICAL: 'pause=2' enforces a delay between requests for politeness.
+    results = search(query, num=limit, stop=limit, pause=2)
+    while True:
+        url = await loop.run_in_executor(None, next, results, None)
+        if url is None:
+            return
+        yield url
+
+
+async def get_competitor_list(target_name: str, location: str,
+                              search_type: str = "dentist", limit: int = 5,
+                              on_competitor=None) -> list:
     """
     Pivoted function: Uses compliant Google Search to find local business URLs.
     Simulates performance metrics (rating/reviews) based on search rank.
 
+    `on_competitor`, if given, is called with each entry as soon as it is
+    added, so callers can start auditing before the search finishes. If it
+    returns a task (anything with .cancel()), that task is cancelled when
+    its entry is dropped in favour of the fallback list.
+
     NOTE: Google API is bypassed due to zero-investment constraint.
     """
 
@@ -44,10 +146,15 @@ def get_competitor_list(target_name: str, location: str,
     )
 
     competitor_data = []
+    started = []
+
+    def add(item):
+        competitor_data.append(item)
+        if on_competitor is not None:
+            started.append(on_competitor(item))
 
     try:
-        # CRITICAL: 'pause=2' enforces a delay between requests for politeness.
-        for url in search(search_query, num=limit, stop=limit, pause=2):
+        async for url in _stream_search(search_query, limit):
             rank = len(competitor_data) + 1
 
             # --- SIMULATION BASED ON RANK (Zero-Investment Data) ---
@@ -55,52 +162,157 @@ def get_competitor_list(target_name: str, location: str,
             simulated_reviews = 500 - (rank * 80)
             simulated_rating = 5.0 - (rank * 0.15)
 
-            competitor_data.append({
+            add({
                 "name": f"Local Competitor Rank {rank}",
                 "rating": round(max(4.2, simulated_rating), 1),
                 "reviews": max(100, simulated_reviews),
                 "url": url
             })
 
-            time.sleep(1)  # Extra politeness delay
-
     except Exception as e:
         print(f"Search failed (Rate limit or network error): {e}")
-        # Fallback list used if the network or search limits are hit
-        competitor_data = [
+        # Fallback list used if the network or search limits are hit.
+        # Audits already started for the discarded results are cancelled.
+        for task in started:
+            if task is not None:
+                task.cancel()
+        competitor_data = []
+        for item in [
             {"name": "Competitor A (Fallback)", "rating": 4.9, "reviews": 300,
              "url": "http://comp-a-fallback.com"},
             {"name": "Competitor B (Fallback)", "rating": 4.7, "reviews": 150,
              "url": "http://comp-b-fallback.com"},
-        ]
+        ]:
+            add(item)
 
     # Add the target business (assumed to have poor metrics)
-    competitor_data.append({
+    add({
         "name": target_name,
         "rating": 3.8,  # Low rating drives the "pain"
         "reviews": 45,  # Low review count drives the "gap"
-        "url": "http://target-site-to-audit.com"
+        "url": "http://target-site-to-audit.com",
+        "is_target": True
     })
 
     return competitor_data
 
 
-def audit_website_flaws(url: str) -> dict:
+async def _fetch_with_retry(client: httpx.AsyncClient,
+                            url: str) -> tuple[int, bytes]:
+    """
+    GETs at most AUDIT_MAX_BODY_BYTES of a page, retrying connection
+    errors/timeouts with backoff. Returns (status_code, body).
+    """
+    for attempt in range(AUDIT_MAX_RETRIES + 1):
+        try:
+            body = bytearray()
+            async with client.stream("GET", url) as response:
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) >= AUDIT_MAX_BODY_BYTES:
+                        break
+            return response.status_code, bytes(body[:AUDIT_MAX_BODY_BYTES])
+        except (httpx.NetworkError, httpx.TimeoutException,
+                httpx.RemoteProtocolError):
+            if attempt == AUDIT_MAX_RETRIES:
+                raise
+            await asyncio.sleep(AUDIT_BACKOFF_FACTOR * (2 ** attempt))
+
+
+def _html_parser() -> etree.HTMLParser:
+    """Returns this thread's reusable lxml HTML parser."""
+    parser = getattr(_PARSER, "parser", None)
+    if parser is None:
+        parser = etree.HTMLParser()
+        _PARSER.parser = parser
+    return parser
+
+
+def _anchor_mentions_appointment(body: bytes) -> bool:
+    """True if any <a> anchor text on the page mentions 'appointment'."""
+    root = etree.fromstring(body, _html_parser())
+    return root is not None and bool(root.xpath(_CTA_XPATH))
+
+
+async def _has_appointment_cta(body: bytes) -> bool:
+    """
+    Checks a page for an appointment CTA. The cheap bytes-level pre-filter
+    runs inline; only pages that mention the keyword are parsed, on a worker
+    thread (lxml releases the GIL) so the event loop stays free.
+    """
+    if b'appointment' not in body.lower():
+        return False
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _anchor_mentions_appointment,
+                                      body)
+
+
+def _audit_db():
+    """
+    Opens the on-disk audit cache on first use, dropping expired rows.
+    Returns None if the cache file cannot be used; audits then run uncached.
+    """
+    global _AUDIT_DB
+    if _AUDIT_DB is None:
+        try:
+            db = sqlite3.connect(AUDIT_CACHE_PATH)
+            db.execute("CREATE TABLE IF NOT EXISTS audits ("
+                       "url TEXT PRIMARY KEY, "
+                       "stored_at REAL NOT NULL, "
+                       "audit TEXT NOT NULL)")
+            db.execute("DELETE FROM audits WHERE stored_at < ?",
+                       (time.time() - AUDIT_CACHE_TTL_SECONDS,))
+            db.commit()
+            _AUDIT_DB = db
+        except sqlite3.Error as e:
+            print(f"Audit cache disabled ({AUDIT_CACHE_PATH}): {e}")
+            _AUDIT_DB = False
+    return _AUDIT_DB or None
+
+
+def _get_cached_audit(url: str):
+    """Returns the cached audit for `url` if under 24h old, else None."""
+    db = _audit_db()
+    if db is None:
+        return None
+    row = db.execute("SELECT stored_at, audit FROM audits WHERE url = ?",
+                     (url,)).fetchone()
+    if row is None or time.time() - row[0] > AUDIT_CACHE_TTL_SECONDS:
+        return None
+    return json.loads(row[1])
+
+
+def _cache_audit(url: str, audit: dict) -> None:
+    """Stores (or refreshes) the audit for `url`."""
+    db = _audit_db()
+    if db is None:
+        return
+    db.execute("INSERT OR REPLACE INTO audits VALUES (?, ?, ?)",
+               (url, time.time(), json.dumps(audit)))
+    db.commit()
+
+
+async def audit_website_flaws(client: httpx.AsyncClient, url: str) -> dict:
     """Performs non-JS audit (SSL, basic mobile, CTA presence)."""
+    cached = _get_cached_audit(url)
+    if cached is not None:
+        return cached
+
     try:
-        response = requests.get(url, timeout=5, allow_redirects=True)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        status_code, body = await _fetch_with_retry(client, url)
 
         audit = {
             "has_ssl": url.startswith("https"),
             # Check for common CTA text
-            "has_basic_cta": bool(
-                soup.find('a', text=lambda t: t and 'appointment' in t.lower())
-            ),
+            "has_basic_cta": await _has_appointment_cta(body),
         }
+        # Only 2xx pages are cached; error and rate-limit pages (404, 429,
+        # 503, ...) are re-audited next time instead of pinned for a day.
+        if 200 <= status_code < 300:
+            _cache_audit(url, audit)
         return audit
-    except requests.exceptions.RequestException as e:
-        # Catch specific request/connection errors
+    except httpx.HTTPError as e:
+        # Catch specific request/connection errors (including timeouts)
         return {"error": str(e), "has_ssl": False, "has_basic_cta": False}
 
 
@@ -110,17 +322,23 @@ def model_revenue_gap(competitor_data: list) -> float:
     'Competitive Dominance Score'.
     """
     # This is the core 'magic lure' that justifies the $499 subscription.
-    df = pd.DataFrame(competitor_data)
+    # Ratings/reviews are packed into flat arrays so scoring is a single
+    # vectorized expression, which scales to batch runs over many targets.
+    count = len(competitor_data)
+    ratings = np.fromiter((c['rating'] for c in competitor_data),
+                          dtype=np.float64, count=count)
+    reviews = np.fromiter((c['reviews'] for c in competitor_data),
+                          dtype=np.float64, count=count)
+    # The target is tagged when the list is built, so no name matching here.
+    is_target = np.fromiter((c.get('is_target', False)
+                             for c in competitor_data),
+                            dtype=bool, count=count)
 
     # Scoring: Rating is weighted 10x, reviews are weighted 1/50th.
-    df['dominance_score'] = (
-        (df['rating'] * 10) + (df['reviews'] / 50)
-    )
+    scores = (ratings * 10) + (reviews / 50)
 
-    target_score = df.loc[df['name'] == 'Target Business',
-                          'dominance_score'].iloc[0]
-    avg_competitor_score = df.loc[df['name'] != 'Target Business',
-                                  'dominance_score'].mean()
+    target_score = float(scores[is_target][0])
+    avg_competitor_score = float(scores[~is_target].mean())
 
     score_difference = avg_competitor_score - target_score
 
@@ -137,20 +355,40 @@ def model_revenue_gap(competitor_data: list) -> float:
 
 # --- MAIN ORCHESTRATION ---
 
-def generate_crgg_report(target_name, location):
+async def _audit_competitor(semaphore: asyncio.Semaphore,
+                            client: httpx.AsyncClient, item: dict) -> None:
+    """Audits one competitor's site in place, bounded by `semaphore`."""
+    async with semaphore:
+        try:
+            audit_results = await audit_website_flaws(client, item['url'])
+        except Exception as e:
+            audit_results = {"error": str(e), "has_ssl": False,
+                             "has_basic_cta": False}
+    item.update(audit_results)
+
+
+async def generate_crgg_report(target_name, location):
     """Orchestrates the data collection, auditing, and modeling."""
 
-    # 1. Acquire Competitor Data (via SERP scraping)
-    competitor_list = get_competitor_list(target_name, location)
+    async with create_audit_client() as client:
+        # 1. Acquire Competitor Data (via SERP scraping)
+        # 2. Integrate Audit Results (Checking the websites found in step 1)
+        # Each site's audit starts as soon as its URL comes back from the
+        # search, over one pooled client; the semaphore rate-limits audits
+        # instead of sleeping on the critical path. The task group waits for
+        # every audit and cancels the rest if the pipeline fails midway.
+        semaphore = asyncio.Semaphore(AUDIT_CONCURRENCY)
+        async with asyncio.TaskGroup() as audits:
+            competitor_list = await get_competitor_list(
+                target_name, location,
+                on_competitor=lambda item: audits.create_task(
+                    _audit_competitor(semaphore, client, item)
+                )
+            )
 
     if not competitor_list:
         return "CRGG Failed: Could not acquire competitor data."
 
-    # 2. Integrate Audit Results (Checking the websites found in step 1)
-    for item in competitor_list:
-        audit_results = audit_website_flaws(item['url'])
-        item.update(audit_results)
-
     print("-> 2. Audits complete. Data collected.")
 
     # 3. Model Revenue Gap
@@ -174,7 +412,9 @@ if __name__ == "__main__":
     TARGET_LOCATION = "Chicago, IL"
 
     # Run the full pipeline
-    final_report = generate_crgg_report(TARGET_BUSINESS, TARGET_LOCATION)
+    final_report = asyncio.run(
+        generate_crgg_report(TARGET_BUSINESS, TARGET_LOCATION)
+    )
 
     print("\n=======================================================")
     print("    COMPETITIVE REVENUE GAP GENERATOR (CRGG) REPORT")